@@ -1,7 +1,7 @@
 """Persistence and retrieval helpers for live D&D transcription data."""
-""" This is a test of GitHub Sync -- Delete comment later """
 from __future__ import annotations
 
+import functools
 import os
 import re
 import sqlite3
@@ -13,15 +13,22 @@ from typing import Any, Dict, Iterable, List, Optional, Sequence
 DB_PATH = Path(os.environ.get("DUNGEON_ARCHIVE_DB", "dungeon_archive.db"))
 
 
-_conn: Optional[sqlite3.Connection] = None
+_tls = threading.local()
 _lock = threading.RLock()
+_schema_ready = False
+_next_chunk_index: Dict[str, int] = {}
 
 
-def _connect() -> sqlite3.Connection:
+def _connect(read_only: bool = False) -> sqlite3.Connection:
     conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA foreign_keys=ON;")
+    conn.execute("PRAGMA cache_size=-20000;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    conn.execute("PRAGMA mmap_size=268435456;")
+    if read_only:
+        conn.execute("PRAGMA query_only=ON;")
     return conn
 
 
@@ -96,6 +103,13 @@ def _ensure_schema(conn: sqlite3.Connection) -> None:
             FOREIGN KEY(chunk_id) REFERENCES transcript_chunks(id) ON DELETE CASCADE
         );
 
+        CREATE INDEX IF NOT EXISTS ix_world_state_updates_chunk ON world_state_updates(chunk_id);
+        CREATE INDEX IF NOT EXISTS ix_character_events_chunk ON character_events(chunk_id);
+        CREATE INDEX IF NOT EXISTS ix_quest_updates_chunk ON quest_updates(chunk_id);
+        CREATE INDEX IF NOT EXISTS ix_entity_mentions_chunk ON entity_mentions(chunk_id, entity_id);
+        CREATE INDEX IF NOT EXISTS ix_transcript_chunks_session ON transcript_chunks(session_id, id);
+        CREATE INDEX IF NOT EXISTS ix_transcript_chunks_session_idx ON transcript_chunks(session_id, chunk_index);
+
         CREATE VIRTUAL TABLE IF NOT EXISTS transcript_chunks_fts USING fts5(
             transcript,
             metadata
@@ -105,22 +119,45 @@ def _ensure_schema(conn: sqlite3.Connection) -> None:
     conn.commit()
 
 
+def _ensure_schema_once() -> None:
+    # Uses a short-lived connection so read-only threads never open a writer of their own.
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _lock:
+        if not _schema_ready:
+            conn = _connect()
+            try:
+                _ensure_schema(conn)
+            finally:
+                conn.close()
+            _schema_ready = True
+
+
 def _get_conn() -> sqlite3.Connection:
-    global _conn
-    if _conn is None:
-        _conn = _connect()
-        _ensure_schema(_conn)
-    return _conn
+    conn = getattr(_tls, "conn", None)
+    if conn is None:
+        _ensure_schema_once()
+        conn = _tls.conn = _connect()
+    return conn
+
+
+def _reader() -> sqlite3.Connection:
+    """Return this thread's query-only connection; WAL lets it run alongside writers."""
+    conn = getattr(_tls, "reader", None)
+    if conn is None:
+        _ensure_schema_once()
+        conn = _tls.reader = _connect(read_only=True)
+    return conn
 
 
 def ensure_session(session_id: str, started_at: str) -> None:
     conn = _get_conn()
-    with _lock:
+    with _lock, conn:
         conn.execute(
             "INSERT OR IGNORE INTO sessions (id, started_at) VALUES (?, ?)",
             (session_id, started_at),
         )
-        conn.commit()
 
 
 def store_chunk(
@@ -135,139 +172,138 @@ def store_chunk(
     entities: Sequence[Dict[str, Any]] = structured.get("entities", []) or []
 
     with _lock:
-        next_idx = conn.execute(
-            "SELECT COALESCE(MAX(chunk_index) + 1, 0) FROM transcript_chunks WHERE session_id = ?",
-            (session_id,),
-        ).fetchone()[0]
-
-        cur = conn.execute(
-            "INSERT INTO transcript_chunks (session_id, chunk_index, transcript) VALUES (?, ?, ?)",
-            (session_id, next_idx, transcript),
-        )
-        chunk_id = cur.lastrowid
-
-        if world_updates:
-            conn.executemany(
-                "INSERT INTO world_state_updates (chunk_id, location, update_text) VALUES (?, ?, ?)",
-                [
-                    (chunk_id, (item.get("location") or "").strip(), (item.get("update") or "").strip())
-                    for item in world_updates
-                    if item
-                ],
+        # A failed write must not leave this thread's connection holding the write lock.
+        try:
+            next_idx = _next_chunk_index.get(session_id)
+            if next_idx is None:
+                next_idx = conn.execute(
+                    "SELECT COALESCE(MAX(chunk_index) + 1, 0) FROM transcript_chunks WHERE session_id = ?",
+                    (session_id,),
+                ).fetchone()[0]
+
+            cur = conn.execute(
+                "INSERT INTO transcript_chunks (session_id, chunk_index, transcript) VALUES (?, ?, ?)",
+                (session_id, next_idx, transcript),
             )
+            chunk_id = cur.lastrowid
+
+            if world_updates:
+                conn.executemany(
+                    "INSERT INTO world_state_updates (chunk_id, location, update_text) VALUES (?, ?, ?)",
+                    [
+                        (chunk_id, (item.get("location") or "").strip(), (item.get("update") or "").strip())
+                        for item in world_updates
+                        if item
+                    ],
+                )
 
-        if char_events:
-            conn.executemany(
-                "INSERT INTO character_events (chunk_id, character, action, outcome) VALUES (?, ?, ?, ?)",
-                [
-                    (
-                        chunk_id,
-                        (item.get("character") or "Unknown").strip(),
-                        (item.get("action") or "").strip(),
-                        (item.get("outcome") or "").strip(),
-                    )
-                    for item in char_events
-                    if item
-                ],
-            )
+            if char_events:
+                conn.executemany(
+                    "INSERT INTO character_events (chunk_id, character, action, outcome) VALUES (?, ?, ?, ?)",
+                    [
+                        (
+                            chunk_id,
+                            (item.get("character") or "Unknown").strip(),
+                            (item.get("action") or "").strip(),
+                            (item.get("outcome") or "").strip(),
+                        )
+                        for item in char_events
+                        if item
+                    ],
+                )
 
-        if quest_updates:
-            conn.executemany(
-                "INSERT INTO quest_updates (chunk_id, quest, update_text) VALUES (?, ?, ?)",
-                [
-                    (
-                        chunk_id,
-                        (item.get("quest") or "Quest").strip(),
-                        (item.get("update") or "").strip(),
-                    )
-                    for item in quest_updates
-                    if item
-                ],
-            )
+            if quest_updates:
+                conn.executemany(
+                    "INSERT INTO quest_updates (chunk_id, quest, update_text) VALUES (?, ?, ?)",
+                    [
+                        (
+                            chunk_id,
+                            (item.get("quest") or "Quest").strip(),
+                            (item.get("update") or "").strip(),
+                        )
+                        for item in quest_updates
+                        if item
+                    ],
+                )
 
-        if entities:
-            for item in entities:
-                entity_id = _upsert_entity(conn, chunk_id, item)
-                if entity_id:
-                    _link_entity_aliases(conn, entity_id, item.get("aliases") or [])
-                    conn.execute(
+            if entities:
+                alias_rows: List[tuple] = []
+                mention_rows: List[tuple] = []
+                for item in entities:
+                    entity_id = _upsert_entity(conn, chunk_id, item)
+                    if entity_id:
+                        alias_rows.extend(_alias_rows(entity_id, item.get("aliases") or []))
+                        mention_rows.append((entity_id, chunk_id, (item.get("description") or "").strip()))
+                if alias_rows:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO entity_aliases (entity_id, alias) VALUES (?, ?)",
+                        alias_rows,
+                    )
+                if mention_rows:
+                    conn.executemany(
                         "INSERT OR IGNORE INTO entity_mentions (entity_id, chunk_id, mention_text) VALUES (?, ?, ?)",
-                        (entity_id, chunk_id, (item.get("description") or "").strip()),
+                        mention_rows,
                     )
 
-        metadata_blob = _build_metadata_blob(structured)
-        conn.execute(
-            "INSERT INTO transcript_chunks_fts (rowid, transcript, metadata) VALUES (?, ?, ?)",
-            (chunk_id, transcript, metadata_blob),
-        )
+            conn.execute(_FTS_INSERT_SQL, {"chunk_id": chunk_id, "transcript": transcript})
 
-        conn.commit()
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        _next_chunk_index[session_id] = next_idx + 1
 
     return int(chunk_id)
 
 
-def _build_metadata_blob(structured: Dict[str, Any]) -> str:
-    parts: List[str] = []
-
-    for item in structured.get("character_events", []) or []:
-        if not item:
-            continue
-        p = " ".join(
-            filter(
-                None,
-                [
-                    f"Character {item.get('character', '').strip()}",
-                    item.get("action", "").strip(),
-                    item.get("outcome", "").strip(),
-                ],
-            )
-        )
-        if p:
-            parts.append(p)
-
-    for item in structured.get("world_state_updates", []) or []:
-        if not item:
-            continue
-        loc = item.get("location", "").strip()
-        upd = item.get("update", "").strip()
-        if loc or upd:
-            parts.append(f"World {loc}: {upd}".strip())
-
-    for item in structured.get("quest_updates", []) or []:
-        if not item:
-            continue
-        quest = item.get("quest", "").strip()
-        upd = item.get("update", "").strip()
-        if quest or upd:
-            parts.append(f"Quest {quest}: {upd}".strip())
-
-    for item in structured.get("entities", []) or []:
-        if not item:
-            continue
-        name = (item.get("name") or "").strip()
-        kind = (item.get("kind") or "").strip()
-        desc = (item.get("description") or "").strip()
-        alias = ", ".join((item.get("aliases") or []))
-        snippet = " ".join(filter(None, [f"Entity {name}", kind, desc, alias]))
-        if snippet:
-            parts.append(snippet)
-
-    return "\n".join(parts)
+def _sql_words(*columns: str) -> str:
+    # Space-join the non-empty columns in SQL, mirroring " ".join(filter(None, ...)).
+    return " || ".join(f"CASE WHEN {col} <> '' THEN ' ' || {col} ELSE '' END" for col in columns)
+
+
+_ENTITY_ALIASES_SQL = "(SELECT group_concat(alias, ', ') FROM entity_aliases WHERE entity_id = e.id)"
+
+# The FTS metadata column is assembled from the child rows store_chunk just
+# wrote, so the structured payload is not walked a second time in Python.
+_FTS_INSERT_SQL = f"""
+INSERT INTO transcript_chunks_fts (rowid, transcript, metadata)
+SELECT :chunk_id, :transcript, COALESCE(group_concat(line, char(10)), '') FROM (
+    SELECT 1 AS section, id AS ord, 'Character' || {_sql_words("character", "action", "outcome")} AS line
+    FROM character_events WHERE chunk_id = :chunk_id
+    UNION ALL
+    SELECT 2, id, trim('World ' || location || ': ' || update_text)
+    FROM world_state_updates WHERE chunk_id = :chunk_id AND (location <> '' OR update_text <> '')
+    UNION ALL
+    SELECT 3, id, trim('Quest ' || quest || ': ' || update_text)
+    FROM quest_updates WHERE chunk_id = :chunk_id AND (quest <> '' OR update_text <> '')
+    UNION ALL
+    SELECT 4, em.id, 'Entity ' || e.name || {_sql_words("e.kind", "e.description", _ENTITY_ALIASES_SQL)}
+    FROM entity_mentions em
+    JOIN entities e ON e.id = em.entity_id
+    WHERE em.chunk_id = :chunk_id
+    ORDER BY section, ord
+)
+"""
+
+
+_KIND_MAP = {
+    "pc": "player",
+    "player": "player",
+    "npc": "npc",
+    "creature": "creature",
+    "monster": "creature",
+    "item": "item",
+}
+_KIND_FAST = frozenset({"player", "npc", "creature", "item", "unknown"})
 
 
 def _normalize_kind(kind: Optional[str]) -> str:
+    if kind in _KIND_FAST:
+        return kind
     if not kind:
         return "unknown"
     clean = kind.strip().lower()
-    mapping = {
-        "pc": "player",
-        "player": "player",
-        "npc": "npc",
-        "creature": "creature",
-        "monster": "creature",
-        "item": "item",
-    }
-    return mapping.get(clean, clean or "unknown")
+    return _KIND_MAP.get(clean, clean or "unknown")
 
 
 def _upsert_entity(conn: sqlite3.Connection, chunk_id: int, record: Dict[str, Any]) -> Optional[int]:
@@ -277,47 +313,34 @@ def _upsert_entity(conn: sqlite3.Connection, chunk_id: int, record: Dict[str, An
     kind = _normalize_kind(record.get("kind"))
     description = (record.get("description") or "").strip()
 
-    current = conn.execute(
-        "SELECT id, kind, description, first_chunk_id FROM entities WHERE name = ?",
-        (name,),
+    # Known kinds are never downgraded to 'unknown' and the longest description wins.
+    row = conn.execute(
+        "INSERT INTO entities (name, kind, description, first_chunk_id, last_chunk_id) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET "
+        "kind = CASE WHEN entities.kind IN ('', 'unknown') AND excluded.kind <> 'unknown' "
+        "THEN excluded.kind ELSE COALESCE(NULLIF(entities.kind, ''), 'unknown') END, "
+        "description = CASE WHEN length(excluded.description) > length(COALESCE(entities.description, '')) "
+        "THEN excluded.description ELSE COALESCE(entities.description, '') END, "
+        "last_chunk_id = excluded.last_chunk_id "
+        "RETURNING id",
+        (name, kind or "unknown", description, chunk_id, chunk_id),
     ).fetchone()
 
-    if current:
-        entity_id = int(current["id"])
-        new_kind = kind if current["kind"] in {"", "unknown"} and kind != "unknown" else current["kind"]
-        if not new_kind:
-            new_kind = "unknown"
-        new_description = description if description and len(description) > len(current["description"] or "") else current["description"]
-        conn.execute(
-            "UPDATE entities SET kind = ?, description = ?, last_chunk_id = ? WHERE id = ?",
-            (new_kind, new_description or "", chunk_id, entity_id),
-        )
-    else:
-        cur = conn.execute(
-            "INSERT INTO entities (name, kind, description, first_chunk_id, last_chunk_id) VALUES (?, ?, ?, ?, ?)",
-            (name, kind or "unknown", description, chunk_id, chunk_id),
-        )
-        entity_id = cur.lastrowid
-
-    return int(entity_id)
+    return int(row[0])
 
 
-def _link_entity_aliases(
-    conn: sqlite3.Connection,
-    entity_id: int,
-    aliases: Sequence[str],
-) -> None:
+def _alias_rows(entity_id: int, aliases: Sequence[str]) -> List[tuple]:
+    rows: List[tuple] = []
     for alias in aliases:
         alias_clean = (alias or "").strip()
-        if not alias_clean:
-            continue
-        conn.execute(
-            "INSERT OR IGNORE INTO entity_aliases (entity_id, alias) VALUES (?, ?)",
-            (entity_id, alias_clean),
-        )
+        if alias_clean:
+            rows.append((entity_id, alias_clean))
+    return rows
+
 
+_TOKEN_RE = re.compile(r"[\w']+")
 
-_STOPWORDS = {
+_STOPWORDS = frozenset({
     "what",
     "where",
     "who",
@@ -340,21 +363,16 @@ _STOPWORDS = {
     "was",
     "were",
     "with",
-}
+})
 
 
 def _question_to_fts(query: str) -> str:
-    tokens = re.findall(r"[\w']+", query.lower())
+    tokens = _TOKEN_RE.findall(query.lower())
     cleaned = [tok for tok in tokens if tok not in _STOPWORDS and len(tok) > 1]
     if not cleaned:
         cleaned = tokens
     # Deduplicate while preserving order
-    seen = set()
-    uniq: List[str] = []
-    for tok in cleaned:
-        if tok not in seen:
-            uniq.append(tok)
-            seen.add(tok)
+    uniq = list(dict.fromkeys(cleaned))
     if not uniq:
         return ""
     return " AND ".join(uniq[:6])
@@ -365,78 +383,35 @@ def search_chunks(
     session_id: Optional[str] = None,
     limit: int = 5,
 ) -> List[Dict[str, Any]]:
-    conn = _get_conn()
     fts_query = _question_to_fts(question)
-    rows: List[sqlite3.Row] = []
-
-    with _lock:
-        try:
-            if fts_query:
-                sql = (
-                    "SELECT t.id, t.session_id, t.chunk_index, t.transcript, t.created_at, "
-                    "snippet(transcript_chunks_fts, 0, '[', ']', '…', 48) AS transcript_snippet, "
-                    "snippet(transcript_chunks_fts, 1, '[', ']', '…', 48) AS metadata_snippet "
-                    "FROM transcript_chunks_fts JOIN transcript_chunks t ON t.id = transcript_chunks_fts.rowid "
-                    "WHERE transcript_chunks_fts MATCH ? "
-                )
-                params: List[Any] = [fts_query]
-                if session_id:
-                    sql += "AND t.session_id = ? "
-                    params.append(session_id)
-                sql += "ORDER BY t.id DESC LIMIT ?"
-                params.append(limit)
-                cur = conn.execute(sql, params)
-            else:
-                sql = (
-                    "SELECT id, session_id, chunk_index, transcript, created_at, transcript AS transcript_snippet, '' AS metadata_snippet "
-                    "FROM transcript_chunks WHERE 1 = 1 "
-                )
-                params = []
-                if session_id:
-                    sql += "AND session_id = ? "
-                    params.append(session_id)
-                sql += "ORDER BY id DESC LIMIT ?"
-                params.append(limit)
-                cur = conn.execute(sql, params)
-            rows = cur.fetchall()
-        except sqlite3.OperationalError:
-            # Fallback to LIKE search if MATCH fails (e.g., query contains reserved tokens)
-            pattern = f"%{question.strip()}%"
-            sql = (
-                "SELECT id, session_id, chunk_index, transcript, created_at, transcript AS transcript_snippet, '' AS metadata_snippet "
-                "FROM transcript_chunks WHERE transcript LIKE ?"
-            )
-            params = [pattern]
-            if session_id:
-                sql += " AND session_id = ?"
-                params.append(session_id)
-            sql += " ORDER BY id DESC LIMIT ?"
-            params.append(limit)
-            cur = conn.execute(sql, params)
-            rows = cur.fetchall()
 
+    conn = _reader()
+    rows = _match_chunks(conn, question, fts_query, session_id, limit)
     if not rows:
         return []
 
     chunk_ids = [int(r["id"]) for r in rows]
     world_updates = _rows_by_chunk(
         conn,
-        "SELECT chunk_id, location, update_text FROM world_state_updates WHERE chunk_id IN ({})".format(
-            _sql_placeholders(chunk_ids)
+        _in_sql(
+            "SELECT chunk_id, location, update_text FROM world_state_updates WHERE chunk_id IN ({})",
+            len(chunk_ids),
         ),
         chunk_ids,
     )
     char_events = _rows_by_chunk(
         conn,
-        "SELECT chunk_id, character, action, outcome FROM character_events WHERE chunk_id IN ({})".format(
-            _sql_placeholders(chunk_ids)
+        _in_sql(
+            "SELECT chunk_id, character, action, outcome FROM character_events WHERE chunk_id IN ({})",
+            len(chunk_ids),
         ),
         chunk_ids,
     )
     quest_updates = _rows_by_chunk(
         conn,
-        "SELECT chunk_id, quest, update_text FROM quest_updates WHERE chunk_id IN ({})".format(
-            _sql_placeholders(chunk_ids)
+        _in_sql(
+            "SELECT chunk_id, quest, update_text FROM quest_updates WHERE chunk_id IN ({})",
+            len(chunk_ids),
         ),
         chunk_ids,
     )
@@ -464,8 +439,63 @@ def search_chunks(
     return results
 
 
-def _sql_placeholders(values: Sequence[Any]) -> str:
-    return ",".join(["?"] * len(values)) or "?"
+def _match_chunks(
+    conn: sqlite3.Connection,
+    question: str,
+    fts_query: str,
+    session_id: Optional[str],
+    limit: int,
+) -> List[sqlite3.Row]:
+    try:
+        if fts_query:
+            sql = (
+                "SELECT t.id, t.session_id, t.chunk_index, t.transcript, t.created_at, "
+                "snippet(transcript_chunks_fts, 0, '[', ']', '…', 48) AS transcript_snippet, "
+                "snippet(transcript_chunks_fts, 1, '[', ']', '…', 48) AS metadata_snippet "
+                "FROM transcript_chunks_fts JOIN transcript_chunks t ON t.id = transcript_chunks_fts.rowid "
+                "WHERE transcript_chunks_fts MATCH ? "
+            )
+            params: List[Any] = [fts_query]
+            if session_id:
+                sql += "AND t.session_id = ? "
+                params.append(session_id)
+            sql += "ORDER BY t.id DESC LIMIT ?"
+            params.append(limit)
+            cur = conn.execute(sql, params)
+        else:
+            sql = (
+                "SELECT id, session_id, chunk_index, transcript, created_at, transcript AS transcript_snippet, '' AS metadata_snippet "
+                "FROM transcript_chunks WHERE 1 = 1 "
+            )
+            params = []
+            if session_id:
+                sql += "AND session_id = ? "
+                params.append(session_id)
+            sql += "ORDER BY id DESC LIMIT ?"
+            params.append(limit)
+            cur = conn.execute(sql, params)
+        return cur.fetchall()
+    except sqlite3.OperationalError:
+        # Fallback to LIKE search if MATCH fails (e.g., query contains reserved tokens)
+        pattern = f"%{question.strip()}%"
+        sql = (
+            "SELECT id, session_id, chunk_index, transcript, created_at, transcript AS transcript_snippet, '' AS metadata_snippet "
+            "FROM transcript_chunks WHERE transcript LIKE ?"
+        )
+        params = [pattern]
+        if session_id:
+            sql += " AND session_id = ?"
+            params.append(session_id)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return conn.execute(sql, params).fetchall()
+
+
+@functools.lru_cache(maxsize=128)
+def _in_sql(template: str, count: int) -> str:
+    # Memoized only to skip rebuilding the placeholder list; sqlite3's statement
+    # cache is keyed by SQL text, so it hits either way.
+    return template.format(",".join(["?"] * count) or "?")
 
 
 def _rows_by_chunk(conn: sqlite3.Connection, sql: str, chunk_ids: Sequence[int]) -> Dict[int, List[Dict[str, Any]]]:
@@ -488,52 +518,41 @@ def _rows_by_chunk(conn: sqlite3.Connection, sql: str, chunk_ids: Sequence[int])
 
 
 def fetch_recent_chunks(session_id: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
-    conn = _get_conn()
-    with _lock:
-        sql = (
-            "SELECT id, session_id, chunk_index, transcript, created_at FROM transcript_chunks "
-            "WHERE (? IS NULL OR session_id = ?) ORDER BY id DESC LIMIT ?"
-        )
-        cur = conn.execute(sql, (session_id, session_id, limit))
-        rows = cur.fetchall()
+    conn = _reader()
+    sql = (
+        "SELECT id, session_id, chunk_index, transcript, created_at FROM transcript_chunks "
+        "WHERE (? IS NULL OR session_id = ?) ORDER BY id DESC LIMIT ?"
+    )
+    cur = conn.execute(sql, (session_id, session_id, limit))
+    rows = cur.fetchall()
     return [dict(row) for row in rows]
 
 
 def _entities_by_chunk(conn: sqlite3.Connection, chunk_ids: Sequence[int]) -> Dict[int, List[Dict[str, Any]]]:
     if not chunk_ids:
         return {}
-    placeholder = _sql_placeholders(chunk_ids)
     rows = conn.execute(
-        f"SELECT em.chunk_id, e.id AS entity_id, e.name, e.kind, e.description "
-        f"FROM entity_mentions em JOIN entities e ON e.id = em.entity_id "
-        f"WHERE em.chunk_id IN ({placeholder})",
-        list(chunk_ids),
-    ).fetchall()
-
-    if not rows:
-        return {}
-
-    entity_ids = sorted({int(row["entity_id"]) for row in rows})
-    aliases: Dict[int, List[str]] = {}
-    alias_rows = conn.execute(
-        "SELECT entity_id, alias FROM entity_aliases WHERE entity_id IN ({})".format(
-            _sql_placeholders(entity_ids)
+        _in_sql(
+            "SELECT em.chunk_id, e.id AS entity_id, e.name, e.kind, e.description, "
+            "GROUP_CONCAT(ea.alias, char(31)) AS aliases "
+            "FROM entity_mentions em JOIN entities e ON e.id = em.entity_id "
+            "LEFT JOIN entity_aliases ea ON ea.entity_id = e.id "
+            "WHERE em.chunk_id IN ({}) "
+            "GROUP BY em.chunk_id, e.id",
+            len(chunk_ids),
         ),
-        entity_ids,
+        list(chunk_ids),
     ).fetchall()
-    for alias_row in alias_rows:
-        aliases.setdefault(int(alias_row["entity_id"]), []).append(alias_row["alias"])
 
     grouped: Dict[int, List[Dict[str, Any]]] = {}
     for row in rows:
         cid = int(row["chunk_id"])
-        eid = int(row["entity_id"])
         grouped.setdefault(cid, []).append(
             {
                 "name": row["name"],
                 "kind": row["kind"],
                 "description": row["description"],
-                "aliases": aliases.get(eid, []),
+                "aliases": row["aliases"].split("\x1f") if row["aliases"] else [],
             }
         )
     return grouped
@@ -1,24 +1,29 @@
 # Live D&D session transcription and summarization
 # Install dependencies first:
 # pip install requirements.txt
+# Optional (Linux): run under mimalloc for cheaper small allocations, e.g.
+#   LD_PRELOAD=/usr/lib/x86_64-linux-gnu/libmimalloc.so.2 python main.py
 
 from __future__ import annotations
 
 import asyncio
+import copy
+import functools
+import gc
 import inspect
 import json
 import os
 import re
-import sys
 import tempfile
 import time
-from collections import deque
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import httpx
 import numpy as np
-import requests
+import orjson
 import uvicorn
 from db_manager import ensure_session, search_chunks, store_chunk
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
@@ -37,6 +42,18 @@ except Exception:
         "and install ffmpeg via your OS."
     )
 
+try:
+    import uvloop  # noqa: F401  (no Windows wheels; fall back to the stock loop)
+    UVICORN_LOOP = "uvloop"
+except ImportError:
+    UVICORN_LOOP = "asyncio"
+
+try:
+    import httptools  # noqa: F401  (C HTTP parser; uvicorn falls back to h11 without it)
+    UVICORN_HTTP = "httptools"
+except ImportError:
+    UVICORN_HTTP = "h11"
+
 # ---------------- FastAPI ----------------
 app = FastAPI()
 app.add_middleware(
@@ -45,57 +62,136 @@ app.add_middleware(
 )
 
 # ---------------- /ws broadcast ----------------
-ws_clients: set[WebSocket] = set()
+# Each UI client gets its own bounded send queue, drained by one long-lived sender task,
+# so a slow client only ever delays itself.
+UI_SEND_QUEUE_MAX = int(os.environ.get("UI_SEND_QUEUE_MAX", "256"))
+ws_clients: Dict[WebSocket, asyncio.Queue] = {}
+# Events dropped per client since its queue filled; logged once when dropping starts and ends.
+ws_dropped: Dict[WebSocket, int] = {}
 
 
-async def broadcast_event(event: Dict[str, Any]) -> None:
-    msg = json.dumps(event, ensure_ascii=False)
-    dead: List[WebSocket] = []
-    for ws in list(ws_clients):
+def broadcast_event(event: Dict[str, Any]) -> None:
+    msg = orjson.dumps(event).decode()
+    for ws, queue in tuple(ws_clients.items()):
         try:
-            await ws.send_text(msg)
-        except Exception:
-            dead.append(ws)
-    for d in dead:
+            queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            dropped = ws_dropped.get(ws, 0)
+            if not dropped:
+                print("[/ws] client send queue full; dropping events")
+            ws_dropped[ws] = dropped + 1
+            continue
+        dropped = ws_dropped.pop(ws, 0)
+        if dropped:
+            print(f"[/ws] client caught up after {dropped} dropped events")
+
+
+async def _drain_ui_queue(websocket: WebSocket, queue: asyncio.Queue) -> None:
+    try:
+        while True:
+            await websocket.send_text(await queue.get())
+    except Exception:
+        # Send failed: the client is gone, so stop queueing for it.
+        ws_clients.pop(websocket, None)
+        ws_dropped.pop(websocket, None)
         try:
-            await d.close()
+            await websocket.close()
         except Exception:
             pass
-        ws_clients.discard(d)
 
 @app.websocket("/ws")
 async def ws_ui(websocket: WebSocket) -> None:
     await websocket.accept()
-    ws_clients.add(websocket)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=UI_SEND_QUEUE_MAX)
+    ws_clients[websocket] = queue
+    sender = asyncio.create_task(_drain_ui_queue(websocket, queue))
     print("[/ws] UI client connected")
     try:
-        await broadcast_event({"heading": "System", "content": "🧭 New adventure begins"})
+        broadcast_event({"heading": "System", "content": "🧭 New adventure begins"})
         while True:
             await websocket.receive_text()  # keepalive
     except WebSocketDisconnect:
         print("[/ws] UI client disconnected")
     finally:
+        ws_clients.pop(websocket, None)
+        ws_dropped.pop(websocket, None)
+        sender.cancel()
         try:
             await websocket.close()
         except Exception:
             pass
-        ws_clients.discard(websocket)
 
 # ---------------- Whisper + config ----------------
 WHISPER_MODEL_SIZE = os.environ.get("WHISPER_MODEL_SIZE", "small.en")
 
 MIN_AVG_LOGPROB = float(os.environ.get("WHISPER_MIN_AVG_LOGPROB", "-2.0"))
 MAX_COMPRESSION_RATIO = float(os.environ.get("WHISPER_MAX_COMPRESSION_RATIO", "3.0"))
+# Stock Whisper hallucinations on near-silent clips (compared lowercased).
+HALLUCINATION_SEGMENTS = frozenset({"thank you.", "okay.", "ok.", "you.", "bye."})
+# Parallel CTranslate2 workers; each /audio connection transcribes from its own thread.
+WHISPER_NUM_WORKERS = max(1, int(os.environ.get("WHISPER_NUM_WORKERS", "2")))
+# int8 weights by default (int8_float16 on CUDA); set WHISPER_COMPUTE_TYPE=auto for the old behaviour.
+WHISPER_COMPUTE_TYPE = os.environ.get("WHISPER_COMPUTE_TYPE", "")
+# "cuda" or "cpu"; empty picks CUDA whenever CTranslate2 can see a GPU.
+WHISPER_DEVICE = os.environ.get("WHISPER_DEVICE", "")
+# Flash attention needs an Ampere+ GPU, so it stays opt-in (CUDA only).
+WHISPER_FLASH_ATTENTION = os.environ.get("WHISPER_FLASH_ATTENTION", "0") == "1"
+# Decode one second of silence after loading (at startup) so the first utterance doesn't pay for kernel setup.
+WHISPER_WARMUP = os.environ.get("WHISPER_WARMUP", "1") == "1"
+WHISPER_CPU_THREADS = int(os.environ.get("WHISPER_CPU_THREADS", max(1, (os.cpu_count() or 2) // 2)))
+# Live mode decodes greedily; set WHISPER_BEAM_SIZE=5 for beam search on longer clips
+# (e.g. offline re-runs). Short clips also skip the initial prompt.
+WHISPER_BEAM_SIZE = int(os.environ.get("WHISPER_BEAM_SIZE", "1"))
+WHISPER_SHORT_BEAM_SIZE = int(os.environ.get("WHISPER_SHORT_BEAM_SIZE", "1"))
+WHISPER_SHORT_UTTER_MS = int(os.environ.get("WHISPER_SHORT_UTTER_MS", "2000"))
+# Mid-length clips cap the beam at 3; only clips past this use the full WHISPER_BEAM_SIZE.
+WHISPER_MID_UTTER_MS = int(os.environ.get("WHISPER_MID_UTTER_MS", "8000"))
+# Greedy results with a segment below WHISPER_RETRY_LOGPROB are decoded again with this
+# beam (clips shorter than WHISPER_RETRY_MAX_MS only); set it to 0 to never retry.
+WHISPER_RETRY_BEAM_SIZE = int(os.environ.get("WHISPER_RETRY_BEAM_SIZE", "5"))
+WHISPER_RETRY_LOGPROB = float(os.environ.get("WHISPER_RETRY_LOGPROB", "-0.9"))
+WHISPER_RETRY_MAX_MS = int(os.environ.get("WHISPER_RETRY_MAX_MS", "10000"))
 
 whisper_model: Optional[WhisperModel] = None
 
+def _default_device() -> str:
+    import ctranslate2  # ships with faster-whisper
+    return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+
 def init_whisper() -> None:
     global whisper_model
     if WhisperModel is not None and whisper_model is None:
-        print("[whisper] loading:", WHISPER_MODEL_SIZE)
-        whisper_model = WhisperModel(WHISPER_MODEL_SIZE, compute_type="auto")
-        print("[whisper] ready")
+        device = WHISPER_DEVICE or _default_device()
+        compute_type = WHISPER_COMPUTE_TYPE or ("int8_float16" if device == "cuda" else "int8")
+        extra = {"flash_attention": True} if WHISPER_FLASH_ATTENTION and device == "cuda" else {}
+        print("[whisper] loading:", WHISPER_MODEL_SIZE, device, compute_type, *extra)
+        whisper_model = WhisperModel(
+            WHISPER_MODEL_SIZE,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=WHISPER_CPU_THREADS,
+            num_workers=WHISPER_NUM_WORKERS,
+            **extra,
+        )
+        if WHISPER_WARMUP:
+            t0 = time.perf_counter()
+            segments, _ = whisper_model.transcribe(
+                np.zeros(SR, dtype=np.float32), beam_size=1, vad_filter=False, without_timestamps=True
+            )
+            list(segments)
+            print(f"[whisper] warm-up {time.perf_counter() - t0:.2f}s")
+        print("[whisper] ready on", whisper_model.model.device)
 
+_whisper_init_lock = asyncio.Lock()
+
+
+async def ensure_whisper() -> None:
+    # Loading and the warm-up decode take seconds; run them off the event loop, once.
+    async with _whisper_init_lock:
+        if whisper_model is None:
+            await asyncio.to_thread(init_whisper)
+
+@functools.lru_cache(maxsize=1)
 def initial_prompt() -> str:
     names = ["Anika (A N I K A)", "Mukul (M U K U L)", "Paul", "Jacob"] # Add your players' names here for better recognition
     return (
@@ -104,6 +200,11 @@ def initial_prompt() -> str:
         "Use 'and' instead of '&'. Avoid filler like 'thank you' or 'okay'."
     )
 
+@functools.lru_cache(maxsize=1)
+def initial_prompt_tokens() -> Tuple[int, ...]:
+    # Same encoding faster-whisper applies to a str prompt, done once instead of per call.
+    return tuple(whisper_model.hf_tokenizer.encode(" " + initial_prompt().strip(), add_special_tokens=False).ids)
+
 # ---------------- Normalizers ----------------
 NUM_WORDS = {
     "zero": 0,
@@ -160,24 +261,29 @@ def number_word_to_int(tok: str) -> Optional[int]:
     return None
 
 _roll_pat = re.compile(r"\b(roll(?:ed|s|ing)?)\s+(?:a|an|the)?\s*([A-Za-z\-]+|\d+)\b", re.I)
+_roll_on_pat = re.compile(r"\broll(?:ed|s|ing)?\s+on\b", re.I)
+_name_pat = re.compile(r"\b(" + "|".join(map(re.escape, NAME_CANON.keys())) + r")\b", re.I) if NAME_CANON else None
+_ws_pat = re.compile(r"\s+")
 
-def normalize_text(text: str) -> str:
-    t = re.sub(r"\s*&\s*", " and ", text)
-    t = re.sub(r"\broll(?:ed|s|ing)?\s+on\b", "rolling a", t, flags=re.I)
 
-    def _fix_roll(m: re.Match) -> str:
-        n = number_word_to_int(m.group(2))
-        return f"{m.group(1)} a {n}" if n is not None else m.group(0)
-    t = _roll_pat.sub(_fix_roll, t)
+def _fix_roll(m: re.Match) -> str:
+    n = number_word_to_int(m.group(2))
+    return f"{m.group(1)} a {n}" if n is not None else m.group(0)
+
 
-    def _canon(m: re.Match) -> str:
-        raw = m.group(0)
-        key = raw.lower()
-        return NAME_CANON.get(key, raw.capitalize())
-    if NAME_CANON:
-        t = re.sub(r"\b(" + "|".join(map(re.escape, NAME_CANON.keys())) + r")\b", _canon, t, flags=re.I)
+def _canon(m: re.Match) -> str:
+    raw = m.group(0)
+    return NAME_CANON.get(raw.lower(), raw.capitalize())
 
-    return re.sub(r"\s+", " ", t).strip()
+
+def normalize_text(text: str) -> str:
+    # '&' padding is collapsed by the final whitespace pass, so a plain replace suffices.
+    t = text.replace("&", " and ")
+    t = _roll_on_pat.sub("rolling a", t)
+    t = _roll_pat.sub(_fix_roll, t)
+    if _name_pat is not None:
+        t = _name_pat.sub(_canon, t)
+    return _ws_pat.sub(" ", t).strip()
 
 # ---------------- Endpointing VAD (20 ms frames) ----------------
 SR = 16000
@@ -195,6 +301,14 @@ HANGOVER_FR        = HANGOVER_MS // FRAME_MS
 MIN_UTTER_FR       = MIN_UTTER_MS // FRAME_MS
 MAX_UTTER_FR       = MAX_UTTER_MS // FRAME_MS
 PREROLL_FR         = PREROLL_MS // FRAME_MS
+# Upper bound on samples in one utterance (pre-roll is copied in on trigger).
+MAX_UTTER_SAMPLES  = max(MAX_UTTER_FR, PREROLL_FR + 1) * FRAME_SAMPLES
+INT16_SCALE        = np.float32(1.0 / 32768.0)
+# Frames whose peak stays under this (int16) are treated as silence without asking
+# webrtcvad, unless an utterance is already open. 0 disables the gate.
+VAD_ENERGY_FLOOR   = int(os.environ.get("VAD_ENERGY_FLOOR", 200))
+# webrtcvad aggressiveness, 0 (least) to 3 (most likely to call a frame non-speech).
+VAD_AGGR           = int(os.environ.get("VAD_AGGR", 2))
 
 class EndpointASR:
     def __init__(self, vad_aggr: int = 2):
@@ -204,40 +318,77 @@ class EndpointASR:
         self.in_speech = False
         self.speech_streak = 0
         self.silence_streak = 0
-        self.cur_frames: List[np.ndarray] = []
-        self.pre_frames: deque[np.ndarray] = deque(maxlen=PREROLL_FR)
+        # Contiguous int16 storage written by index: the current utterance plus a
+        # fixed ring of pre-roll frames, instead of lists of 320-sample arrays.
+        self.cur_buf = np.empty(MAX_UTTER_SAMPLES, dtype=np.int16)
+        self.cur_count = 0
+        self.pre_buf = np.empty((PREROLL_FR, FRAME_SAMPLES), dtype=np.int16)
+        self.pre_count = 0
+        self.pre_pos = 0
+
+    def process_buffer(self, pcm_i16: np.ndarray) -> List[np.ndarray]:
+        """Run VAD over a contiguous run of whole frames and return finished utterances."""
+        n_frames = pcm_i16.size // FRAME_SAMPLES
+        frame_bytes = FRAME_SAMPLES * pcm_i16.itemsize
+        raw = memoryview(np.ascontiguousarray(pcm_i16)).cast("B")
+        is_speech = self.vad.is_speech
+        # Per-frame peak in one vectorized pass (max/min rather than abs, which
+        # overflows on -32768).
+        frames = pcm_i16[: n_frames * FRAME_SAMPLES].reshape(n_frames, FRAME_SAMPLES)
+        loud = (frames.max(axis=1) >= VAD_ENERGY_FLOOR) | (frames.min(axis=1) <= -VAD_ENERGY_FLOOR)
+        out: List[np.ndarray] = []
+        for i in range(n_frames):
+            # Zero-copy memoryview slices go straight to webrtcvad.
+            speech = (self.in_speech or loud[i]) and is_speech(raw[i * frame_bytes:(i + 1) * frame_bytes], SR)
+            out.extend(self._advance(frames[i], speech))
+        return out
 
-    def process_frame(self, frame_i16: np.ndarray) -> List[np.ndarray]:
+    def _advance(self, frame_i16: np.ndarray, is_speech: bool) -> List[np.ndarray]:
         out: List[np.ndarray] = []
-        is_speech = self.vad.is_speech(frame_i16.tobytes(), SR)
 
         if not self.in_speech:
-            self.pre_frames.append(frame_i16)
+            self._push_preroll(frame_i16)
             if is_speech:
                 self.speech_streak += 1
                 if self.speech_streak >= START_TRIGGER_FR:
                     self.in_speech = True
-                    self.cur_frames = list(self.pre_frames)
+                    self._load_preroll()
                     self.silence_streak = 0
             else:
                 self.speech_streak = 0
         else:
             if is_speech:
-                self.cur_frames.append(frame_i16)
+                start = self.cur_count * FRAME_SAMPLES
+                self.cur_buf[start:start + FRAME_SAMPLES] = frame_i16
+                self.cur_count += 1
                 self.silence_streak = 0
-                if len(self.cur_frames) >= MAX_UTTER_FR:
+                if self.cur_count >= MAX_UTTER_FR:
                     out.append(self._finalize())
             else:
                 self.silence_streak += 1
                 if self.silence_streak >= HANGOVER_FR:
-                    if len(self.cur_frames) >= MIN_UTTER_FR:
+                    if self.cur_count >= MIN_UTTER_FR:
                         out.append(self._finalize())
                     else:
                         self._reset_utterance()
         return out
 
+    def _push_preroll(self, frame_i16: np.ndarray) -> None:
+        if not PREROLL_FR:
+            return
+        self.pre_buf[self.pre_pos] = frame_i16
+        self.pre_pos = (self.pre_pos + 1) % PREROLL_FR
+        self.pre_count = min(self.pre_count + 1, PREROLL_FR)
+
+    def _load_preroll(self) -> None:
+        n = self.pre_count
+        if n:
+            order = (self.pre_pos - n + np.arange(n)) % PREROLL_FR
+            self.cur_buf[: n * FRAME_SAMPLES] = self.pre_buf[order].reshape(-1)
+        self.cur_count = n
+
     def _finalize(self) -> np.ndarray:
-        pcm = np.concatenate(self.cur_frames).astype(np.int16)
+        pcm = self.cur_buf[: self.cur_count * FRAME_SAMPLES].copy()
         self._reset_utterance()
         return pcm
 
@@ -245,8 +396,9 @@ class EndpointASR:
         self.in_speech = False
         self.speech_streak = 0
         self.silence_streak = 0
-        self.cur_frames = []
-        self.pre_frames.clear()
+        self.cur_count = 0
+        self.pre_count = 0
+        self.pre_pos = 0
 
 # ---------------- Pydantic schema (Divyansh's style from STT.ipynb) ------------------
 
@@ -281,10 +433,25 @@ class ChunkStructuredOutput(BaseModel):
     quest_updates: List[QuestUpdate] = Field(default_factory=list, description="List of quest updates in this chunk")
     entities: List[EntityRecord] = Field(default_factory=list, description="Entities mentioned in this chunk")
 
+# JSON schema handed to Ollama's structured-output `format`, built once.
+CHUNK_JSON_SCHEMA = ChunkStructuredOutput.model_json_schema()
+
 # ---------------- Summarizer: AutoGen → Ollama (await-safe) ----------------
 OLLAMA_URL  = os.environ.get("OLLAMA_URL", "http://127.0.0.1:11434")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "gemma3:12b")
 
+# One pooled async client for the summarizer and /ask, so Ollama calls never tie up executor threads.
+_ollama_client = httpx.AsyncClient(
+    base_url=OLLAMA_URL,
+    timeout=httpx.Timeout(60.0, connect=5.0),
+    limits=httpx.Limits(max_keepalive_connections=8, keepalive_expiry=30.0),
+)
+
+
+@app.on_event("shutdown")
+async def _close_ollama_client() -> None:
+    await _ollama_client.aclose()
+
 SYSTEM_PROMPT = """You are a meticulous Dungeon Master's Assistant. Return ONLY valid JSON that matches:
 
 {
@@ -308,19 +475,20 @@ AUTO_CLIENT: Optional[Any] = None
 AUTO_READY: bool = False
 
 
-def _best_json_block(text: str) -> Optional[str]:
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _best_json_obj(text: str) -> Optional[Dict[str, Any]]:
+    # raw_decode does the brace matching (string-aware) and parsing in C; keep its result
+    # rather than slicing the block out and parsing it a second time.
     start = text.find("{")
     if start == -1:
         return None
-    depth = 0
-    for i, ch in enumerate(text[start:], start=start):
-        if ch == "{":
-            depth += 1
-        elif ch == "}":
-            depth -= 1
-            if depth == 0:
-                return text[start : i + 1]
-    return None
+    try:
+        obj, _ = _JSON_DECODER.raw_decode(text, start)
+    except json.JSONDecodeError:
+        return None
+    return obj
 
 def init_autogen() -> None:
     global AUTO_CLIENT, AUTO_READY
@@ -341,9 +509,30 @@ def init_autogen() -> None:
         AUTO_CLIENT = None
         print(f"[autogen] init failed: {type(e).__name__}: {e}. Falling back to HTTP/rule-based.")
 
+# Circuit breaker: after AUTOGEN_MAX_FAILS misses in a row, skip AutoGen for a cooldown.
+AUTOGEN_MAX_FAILS = int(os.environ.get("AUTOGEN_MAX_FAILS", "3"))
+AUTOGEN_COOLDOWN_S = float(os.environ.get("AUTOGEN_COOLDOWN_S", "300"))
+_autogen_fails = 0
+_autogen_disabled_until = 0.0
+
+
 async def summarize_with_autogen(text: str) -> Optional[Dict[str, Any]]:
-    if not AUTO_READY or AUTO_CLIENT is None:
+    global _autogen_fails, _autogen_disabled_until
+    if not AUTO_READY or AUTO_CLIENT is None or time.monotonic() < _autogen_disabled_until:
         return None
+    data = await _autogen_summary(text)
+    if data is not None:
+        _autogen_fails = 0
+        return data
+    _autogen_fails += 1
+    if _autogen_fails >= AUTOGEN_MAX_FAILS:
+        _autogen_fails = 0
+        _autogen_disabled_until = time.monotonic() + AUTOGEN_COOLDOWN_S
+        print(f"[autogen] {AUTOGEN_MAX_FAILS} failures in a row; skipping it for {AUTOGEN_COOLDOWN_S:.0f}s")
+    return None
+
+
+async def _autogen_summary(text: str) -> Optional[Dict[str, Any]]:
     try:
         maybe = AUTO_CLIENT.create(messages=[{"role": "user", "content": text}])
         resp = await maybe if inspect.isawaitable(maybe) else maybe
@@ -358,36 +547,42 @@ async def summarize_with_autogen(text: str) -> Optional[Dict[str, Any]]:
                 return resp
             content = resp.get("content")
             if isinstance(content, str):
-                block = _best_json_block(content)
-                return _ensure_chunk_keys(json.loads(block)) if block else None
+                obj = _best_json_obj(content)
+                return _ensure_chunk_keys(obj) if obj is not None else None
         # Chat-like object
         content = getattr(resp, "content", None)
         if isinstance(content, str):
-            block = _best_json_block(content)
-            return _ensure_chunk_keys(json.loads(block)) if block else None
+            obj = _best_json_obj(content)
+            return _ensure_chunk_keys(obj) if obj is not None else None
     except Exception as e:
         print(f"[autogen] summarizer error: {type(e).__name__}: {e}")
     return None
 
 # ---- Ollama HTTP JSON mode (backup if AutoGen fails)
-def summarize_with_ollama_http_sync(text: str) -> Optional[Dict[str, Any]]:
+async def summarize_with_ollama_http(text: str) -> Optional[Dict[str, Any]]:
     try:
         payload = {
             "model": OLLAMA_MODEL,
             "stream": False,
+            # Schema-constrained decoding: the reply is the JSON object itself.
+            "format": CHUNK_JSON_SCHEMA,
             "options": {"temperature": 0.1},
             "messages": [
                 {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": text},
             ],
         }
-        r = requests.post(f"{OLLAMA_URL}/api/chat", json=payload, timeout=60)
+        r = await _ollama_client.post("/api/chat", json=payload)
         r.raise_for_status()
-        content = r.json().get("message", {}).get("content", "") or ""
-        block = _best_json_block(content.strip())
-        if not block:
+        content = orjson.loads(r.content).get("message", {}).get("content", "") or ""
+        try:
+            obj = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # Server ignored the schema (older Ollama); dig the object out of the prose.
+            obj = _best_json_obj(content.strip())
+        if not isinstance(obj, dict):
             return None
-        return _ensure_chunk_keys(json.loads(block))
+        return _ensure_chunk_keys(obj)
     except Exception as e:
         print(f"[ollama-http] error: {type(e).__name__}: {e}")
         return None
@@ -396,18 +591,19 @@ def summarize_with_ollama_http_sync(text: str) -> Optional[Dict[str, Any]]:
 SENT_SPLIT = re.compile(r'(?<=[.!?])\s+')
 FILLER_RX = re.compile(r"\b(uh|um|like|you know|i mean|sort of|kind of|basically|literally)\b", re.I)
 
-EXPECTED_CHUNK_KEYS = {"world_state_updates", "character_events", "quest_updates", "entities"}
+_CHUNK_KEYS = ("world_state_updates", "character_events", "quest_updates", "entities")
+EXPECTED_CHUNK_KEYS = frozenset(_CHUNK_KEYS)
 
 
 def _ensure_chunk_keys(data: Dict[str, Any]) -> Dict[str, Any]:
-    for key in EXPECTED_CHUNK_KEYS:
-        if key not in data or data[key] is None:
+    for key in _CHUNK_KEYS:
+        if data.get(key) is None:
             data[key] = []
     return data
 
 def _clean_sentence(s: str) -> str:
     s = FILLER_RX.sub("", s)
-    s = re.sub(r"\s+", " ", s).strip(" -")
+    s = _ws_pat.sub(" ", s).strip(" -")
     return s
 
 def _cap(s: str, n: int) -> str:
@@ -418,20 +614,28 @@ def _cap(s: str, n: int) -> str:
         cut = n
     return s[:cut].rstrip() + "…"
 
+ROLL_EVENT_RX = re.compile(r"\b([A-Z][a-z]+)\s+rolled\s+a\s+(\d{1,2})\b")
+ACTION_RX = re.compile(r"\b(attacks?|casts?|shoots?|checks?|sneaks?|stealth|investigat|perception|roll(?:ed|s)?)\b")
+WORLD_RX = re.compile(r"\b(room|door|hall|corridor|tavern|forest|dungeon|street|camp|party|village|town|map)\b")
+QUEST_RX = re.compile(r"\b(quest|clue|contract|bounty|rumor|lead|goal|objective|mission)\b")
+# Common sentence-initial words are excluded in the pattern itself.
+NAME_CANDIDATE_RX = re.compile(r"\b(?!(?:The|When|They|That|There)\b)([A-Z][a-z]{2,})\b")
+
+
 def summarize_rule_based_sync(text: str) -> Dict[str, Any]:
     low = text.lower()
     out = {"world_state_updates": [], "character_events": [], "quest_updates": [], "entities": []}
 
-    for name, num in re.findall(r"\b([A-Z][a-z]+)\s+rolled\s+a\s+(\d{1,2})\b", text):
+    for name, num in ROLL_EVENT_RX.findall(text):
         out["character_events"].append({"character": name, "action": f"rolled a {num}", "outcome": ""})
 
-    if re.search(r"\b(attacks?|casts?|shoots?|checks?|sneaks?|stealth|investigat|perception|roll(?:ed|s)?)\b", low):
+    if ACTION_RX.search(low):
         out["character_events"].append({"character": "Unknown", "action": _cap(text, 140), "outcome": ""})
 
-    if re.search(r"\b(room|door|hall|corridor|tavern|forest|dungeon|street|camp|party|village|town|map)\b", low):
+    if WORLD_RX.search(low):
         out["world_state_updates"].append({"location": "World", "update": _cap(text, 160)})
 
-    if re.search(r"\b(quest|clue|contract|bounty|rumor|lead|goal|objective|mission)\b", low):
+    if QUEST_RX.search(low):
         out["quest_updates"].append({"quest": "Quest", "update": _cap(text, 160)})
 
     if not any(out[key] for key in ("world_state_updates", "character_events", "quest_updates")):
@@ -445,28 +649,58 @@ def summarize_rule_based_sync(text: str) -> Dict[str, Any]:
         if top:
             out["world_state_updates"].append({"location": "Narration", "update": " ".join(top)})
 
-    candidate_names = set()
-    for token in re.findall(r"\b([A-Z][a-z]{2,})\b", text):
-        if token in {"The", "When", "They", "That", "There"}:
-            continue
-        candidate_names.add(token)
+    candidate_names = sorted(set(NAME_CANDIDATE_RX.findall(text)))
     if candidate_names:
         out["entities"].extend(
             {"name": name, "kind": "unknown", "description": "", "aliases": []}
-            for name in sorted(candidate_names)
+            for name in candidate_names
         )
 
     return out
 
+# Transcripts shorter than this skip the LLM and go straight to the rule-based summarizer.
+SUMMARY_MIN_WORDS = int(os.environ.get("SUMMARY_MIN_WORDS", "4"))
+
+
+def _is_trivial_transcript(text: str) -> bool:
+    # Pure filler ("uh, um...") or a stock hallucination that survived the raw-segment fallback.
+    return text.strip().lower() in HALLUCINATION_SEGMENTS or not any(ch.isalnum() for ch in FILLER_RX.sub("", text))
+
+
+# LLM summaries of repeated lines ("I rolled a 20") are reused instead of re-asked.
+SUMMARY_CACHE_MAX = int(os.environ.get("SUMMARY_CACHE_MAX", "256"))
+_summary_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+def _remember_summary(key: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    if SUMMARY_CACHE_MAX > 0:
+        _summary_cache[key] = copy.deepcopy(data)
+        if len(_summary_cache) > SUMMARY_CACHE_MAX:
+            _summary_cache.popitem(last=False)
+    return data
+
+
 async def summarize_original_style(text: str) -> Dict[str, Any]:
+    if _is_trivial_transcript(text):
+        return {key: [] for key in _CHUNK_KEYS}
+    if len(text.split()) < SUMMARY_MIN_WORDS:
+        return summarize_rule_based_sync(text)
+
+    key = _ws_pat.sub(" ", text).strip().lower()
+    cached = _summary_cache.get(key)
+    if cached is not None:
+        _summary_cache.move_to_end(key)
+        # Callers get their own copy, so nothing downstream can alter later hits.
+        return copy.deepcopy(cached)
+
     data = await summarize_with_autogen(text)
     if data:
-        return _ensure_chunk_keys(data)
+        return _remember_summary(key, _ensure_chunk_keys(data))
     print("[summarizer] autogen unavailable/invalid; trying Ollama HTTP…")
 
-    data = await asyncio.to_thread(summarize_with_ollama_http_sync, text)
+    data = await summarize_with_ollama_http(text)
     if data:
-        return _ensure_chunk_keys(data)
+        return _remember_summary(key, _ensure_chunk_keys(data))
     print("[summarizer] Ollama HTTP failed; falling back to rule-based.")
 
     return summarize_rule_based_sync(text)
@@ -477,6 +711,11 @@ LOG_DIR.mkdir(exist_ok=True)
 SESSION_ID = time.strftime("%Y%m%d-%H%M%S")
 JSONL_PATH = LOG_DIR / f"session-{SESSION_ID}.jsonl"
 JSON_PATH  = LOG_DIR / f"session-{SESSION_ID}.json"
+# The JSONL file is the durable per-chunk log; the aggregate JSON is a snapshot a
+# background task rewrites this often while new chunks are pending (and once more on shutdown).
+SESSION_JSON_INTERVAL_S = float(os.environ.get("SESSION_JSON_INTERVAL_S", "5.0"))
+_agg_dirty = False
+_agg_flusher: Optional[asyncio.Task] = None
 
 SESSION_AGG = {
     "session_id": SESSION_ID,
@@ -490,35 +729,64 @@ except Exception as db_init_err:
     print(f"[db] session init failed: {db_init_err}")
 
 def _append_jsonl_sync(obj: dict):
-    with JSONL_PATH.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+    with JSONL_PATH.open("ab") as f:
+        f.write(orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE))
 
 def _write_json_atomic_sync(path: Path, obj: dict):
-    with tempfile.NamedTemporaryFile("w", delete=False, encoding="utf-8") as tmp:
-        json.dump(obj, tmp, ensure_ascii=False)
-        tmp.flush()
-        os.fsync(tmp.fileno())
+    # Temp file lives next to the target so os.replace never crosses filesystems.
+    with tempfile.NamedTemporaryFile("wb", delete=False, dir=path.parent) as tmp:
+        tmp.write(orjson.dumps(obj))
         tmp_name = tmp.name
     os.replace(tmp_name, path)
 
 async def persist_chunk_model(chunk_model: ChunkStructuredOutput, transcript: str):
+    # Dump once; every sink below only reads the dict.
+    dumped = chunk_model.model_dump()
     # 1) Append a line (pure pydantic shape)
-    await asyncio.to_thread(_append_jsonl_sync, chunk_model.model_dump())
-    # 2) Update aggregate and write full JSON
-    SESSION_AGG["chunks"].append(chunk_model.model_dump())
-    await asyncio.to_thread(_write_json_atomic_sync, JSON_PATH, SESSION_AGG)
+    await asyncio.to_thread(_append_jsonl_sync, dumped)
+    # 2) Update aggregate; _flush_session_json_loop rewrites the snapshot
+    global _agg_dirty
+    SESSION_AGG["chunks"].append(dumped)
+    _agg_dirty = True
     # 3) Persist structured context into SQLite for retrieval purposes
     try:
         await asyncio.to_thread(
             store_chunk,
             SESSION_ID,
             transcript,
-            chunk_model.model_dump(),
+            dumped,
         )
     except Exception as db_err:
         print(f"[db] chunk persistence failed: {db_err}")
 
 
+async def _flush_session_json_loop() -> None:
+    global _agg_dirty
+    while True:
+        await asyncio.sleep(SESSION_JSON_INTERVAL_S)
+        if _agg_dirty:
+            _agg_dirty = False
+            try:
+                await asyncio.to_thread(_write_json_atomic_sync, JSON_PATH, SESSION_AGG)
+            except Exception as e:
+                _agg_dirty = True
+                print(f"[session] JSON snapshot failed: {e}")
+
+
+@app.on_event("startup")
+async def _start_session_json_flusher() -> None:
+    global _agg_flusher
+    _agg_flusher = asyncio.create_task(_flush_session_json_loop())
+
+
+@app.on_event("shutdown")
+def _flush_session_json() -> None:
+    if _agg_flusher is not None:
+        _agg_flusher.cancel()
+    if _agg_dirty:
+        _write_json_atomic_sync(JSON_PATH, SESSION_AGG)
+
+
 ANSWER_SYSTEM_PROMPT_QA = (
     "You are a lore keeper for a Dungeons & Dragons table."
     " Answer player questions using only the provided session context."
@@ -587,7 +855,7 @@ async def answer_question(question: str, session_id: Optional[str], limit: int)
         prepared.append(ContextChunk(**chunk))
 
     prompt_text = _context_to_prompt(question, prepared)
-    answer = await asyncio.to_thread(_call_ollama_answer, question, prompt_text)
+    answer = await _call_ollama_answer(question, prompt_text)
     if not answer:
         answer = _fallback_answer(prepared)
 
@@ -634,7 +902,7 @@ def _trim_text(text: str, limit: int = 480) -> str:
     return text[: limit - 1].rstrip() + "…"
 
 
-def _call_ollama_answer(question: str, prompt_text: str) -> str:
+async def _call_ollama_answer(question: str, prompt_text: str) -> str:
     try:
         payload = {
             "model": OLLAMA_MODEL,
@@ -645,9 +913,9 @@ def _call_ollama_answer(question: str, prompt_text: str) -> str:
                 {"role": "user", "content": prompt_text},
             ],
         }
-        resp = requests.post(f"{OLLAMA_URL}/api/chat", json=payload, timeout=60)
+        resp = await _ollama_client.post("/api/chat", json=payload)
         resp.raise_for_status()
-        data = resp.json()
+        data = orjson.loads(resp.content)
         answer = data.get("message", {}).get("content", "")
         return answer.strip()
     except Exception as exc:
@@ -695,132 +963,223 @@ async def ask_question(req: QueryRequest):
     return await answer_question(req.question, req.session_id, req.limit)
 
 # ---------------- /audio WebSocket ----------------
+# Most queued-up transcripts merged into one summarized chunk when the worker falls behind.
+SUMMARY_BATCH_MAX = max(1, int(os.environ.get("SUMMARY_BATCH_MAX", "8")))
+
+
+def _beam_size_for(duration_ms: float) -> int:
+    if duration_ms < WHISPER_SHORT_UTTER_MS:
+        return WHISPER_SHORT_BEAM_SIZE
+    if duration_ms < WHISPER_MID_UTTER_MS:
+        return min(WHISPER_BEAM_SIZE, 3)
+    return WHISPER_BEAM_SIZE
+
+
+def _decode(audio_f32: np.ndarray, beam_size: int, short: bool) -> List[Any]:
+    segments, _info = whisper_model.transcribe(
+        audio_f32,
+        language="en",
+        beam_size=beam_size,
+        best_of=1,  # only used when sampling at temperature > 0
+        temperature=0.0,
+        vad_filter=False,
+        condition_on_previous_text=False,
+        # Nothing reads seg.start/seg.end; live clips come back as one segment per window.
+        without_timestamps=True,
+        # Short clips skip the prompt (it can outweigh the audio); NAME_CANON fixes spellings afterwards.
+        initial_prompt=None if short else initial_prompt_tokens(),
+    )
+    # The segment generator decodes lazily; drain it here so the work stays on this thread.
+    return list(segments)
+
+
+def transcribe_sync(audio_f32: np.ndarray) -> List[Any]:
+    duration_ms = audio_f32.size * 1000 / SR
+    short = duration_ms < WHISPER_SHORT_UTTER_MS
+    beam_size = _beam_size_for(duration_ms)
+    print(f"[whisper] {duration_ms / 1000:.1f}s utterance, beam_size={beam_size}")
+    segments = _decode(audio_f32, beam_size, short)
+    if (
+        segments
+        and beam_size < WHISPER_RETRY_BEAM_SIZE
+        and duration_ms < WHISPER_RETRY_MAX_MS
+        and min(getattr(seg, "avg_logprob", 0.0) for seg in segments) < WHISPER_RETRY_LOGPROB
+    ):
+        print(f"[whisper] low confidence; re-decoding with beam_size={WHISPER_RETRY_BEAM_SIZE}")
+        segments = _decode(audio_f32, WHISPER_RETRY_BEAM_SIZE, short)
+    return segments
+
+
+async def transcribe_utterance(utt: np.ndarray, audio_f32_scratch: np.ndarray) -> Optional[str]:
+    # Cast and scale in one pass into the reused scratch buffer. Safe because each
+    # worker handles one utterance at a time and transcribe_sync drains all segments.
+    audio_f32 = audio_f32_scratch[: utt.size]
+    np.multiply(utt, INT16_SCALE, out=audio_f32, dtype=np.float32, casting="unsafe")
+    segments = await asyncio.to_thread(transcribe_sync, audio_f32)
+
+    raw_parts: List[str] = []
+    parts: List[str] = []
+    dropped_segments = 0
+    for seg in segments:
+        txt = (getattr(seg, "text", "") or "").strip()
+        if not txt:
+            continue
+        raw_parts.append(txt)
+        if (
+            txt.lower() in HALLUCINATION_SEGMENTS
+            or getattr(seg, "avg_logprob", 0.0) < MIN_AVG_LOGPROB
+            or getattr(seg, "compression_ratio", 0.0) > MAX_COMPRESSION_RATIO
+        ):
+            dropped_segments += 1
+            continue
+        parts.append(txt)
+
+    if not parts:
+        if raw_parts:
+            if dropped_segments:
+                print(
+                    f"[/audio] low-confidence fallback: using {len(raw_parts)} raw segments "
+                    f"(dropped {dropped_segments} by threshold)"
+                )
+            parts = raw_parts
+        else:
+            return None
+
+    if not parts:
+        return None
+
+    transcript = normalize_text(" ".join(parts))
+    print(f"[/audio] transcript: {transcript}")
+    return transcript
+
+
+async def publish_chunk(transcript: str) -> None:
+    data = await summarize_original_style(transcript)
+
+    # Validate into Pydantic model (ensures exact schema and persist)
+    try:
+        chunk_model = ChunkStructuredOutput.model_validate(data)
+    except Exception:
+        # Fallback: try constructing directly from dict
+        chunk_model = ChunkStructuredOutput(**data)
+
+    await persist_chunk_model(chunk_model, transcript)
+
+    # --- Broadcast mapped to UI (one frame per chunk) ---
+    events: List[Dict[str, Any]] = []
+    for item in chunk_model.world_state_updates:
+        upd = (item.update or "").strip()
+        loc = (item.location or "").strip()
+        if upd:
+            events.append(
+                {
+                    "heading": "World State Update",
+                    "content": upd,
+                    "location": loc,  # expose location for UI display
+                }
+            )
+
+    for item in chunk_model.character_events:
+        who = item.character or "Unknown"
+        action = (item.action or "").strip()
+        outcome = (item.outcome or "").strip()
+        if action:
+            events.append({"heading": f"Character Action: {who}", "content": action})
+        if outcome:
+            events.append({"heading": f"Character Outcome: {who}", "content": outcome})
+
+    for item in chunk_model.quest_updates:
+        quest = item.quest or "Quest"
+        update = (item.update or "").strip()
+        if update:
+            events.append({"heading": "Quest Update", "quest_name": quest, "content": update})
+
+    if events:
+        broadcast_event({"type": "chunk", "events": events})
+
+
+async def transcribe_worker(utt_queue: asyncio.Queue) -> None:
+    """Drain finished utterances for one /audio connection until a None sentinel arrives."""
+    audio_f32_scratch = np.empty(MAX_UTTER_SAMPLES, dtype=np.float32)
+    stopping = False
+    while not stopping:
+        utt = await utt_queue.get()
+        if utt is None:
+            return
+        # Utterances that queued up while we were busy are transcribed now and summarized
+        # together with this one: a backlog costs one LLM call instead of one per utterance.
+        transcripts: List[str] = []
+        while True:
+            try:
+                transcript = await transcribe_utterance(utt, audio_f32_scratch)
+            except Exception as e:
+                print("[/audio] transcribe error:", e)
+                transcript = None
+            if transcript:
+                transcripts.append(transcript)
+            if len(transcripts) >= SUMMARY_BATCH_MAX or utt_queue.empty():
+                break
+            utt = utt_queue.get_nowait()
+            if utt is None:
+                stopping = True
+                break
+        if not transcripts:
+            continue
+        try:
+            await publish_chunk(" ".join(transcripts))
+        except Exception as e:
+            print("[/audio] summarize error:", e)
+
+
+@app.on_event("startup")
+async def _load_models() -> None:
+    try:
+        await ensure_whisper()
+    except Exception as e:
+        # Keep the rest of the app up; ws_audio retries the load on the next connection.
+        print(f"[whisper] init failed: {type(e).__name__}: {e}. /audio will retry on connect.")
+    init_autogen()
+    # Models and import-time objects live for the whole process; keep them out of GC scans.
+    # Done here, before any request, so no per-connection objects get frozen with them.
+    gc.freeze()
+
+
 @app.websocket("/audio")
 async def ws_audio(websocket: WebSocket) -> None:
     await websocket.accept()
     print("[/audio] Audio client connected")
-    init_whisper()
-    init_autogen()
-
-    try:
-        import webrtcvad
-    except ImportError as e:
-        print(f"Import error details: {e}")
-        print(f"Python path: {sys.path}")
-        raise RuntimeError("webrtcvad not installed - check virtual environment")
-    ep = EndpointASR(vad_aggr=2)
-    remainder = np.zeros(0, dtype=np.int16)
+    await ensure_whisper()
+    if AUTO_CLIENT is None:
+        # Only retries when startup couldn't build the client; otherwise it is reused.
+        init_autogen()
+
+    ep = EndpointASR(vad_aggr=VAD_AGGR)
+    # Raw PCM carried between receives; only whole 20 ms frames are consumed.
+    ingest = bytearray()
+    frame_bytes = FRAME_SAMPLES * 2
+    # Whisper and the summarizer run in a worker so the receive loop keeps draining the socket.
+    utt_queue: asyncio.Queue = asyncio.Queue()
+    worker = asyncio.create_task(transcribe_worker(utt_queue))
 
     try:
         while True:
             raw = await websocket.receive_bytes()
             if not raw:
                 continue
-            buf = np.frombuffer(raw, dtype=np.int16)
-            if buf.size == 0:
+            ingest += raw
+            n_frames = len(ingest) // frame_bytes
+            if n_frames == 0:
                 continue
 
-            if remainder.size:
-                buf = np.concatenate([remainder, buf])
-                remainder = np.zeros(0, dtype=np.int16)
-
-            total = (buf.size // FRAME_SAMPLES) * FRAME_SAMPLES
-            frames = buf[:total].reshape(-1, FRAME_SAMPLES)
-            if buf.size > total:
-                remainder = buf[total:]
-
-            utterances: List[np.ndarray] = []
-            for fr in frames:
-                utterances.extend(ep.process_frame(fr))
+            # Zero-copy view over the whole frames; drop it before trimming the
+            # bytearray, which cannot be resized while a buffer export is alive.
+            frames = np.frombuffer(ingest, dtype=np.int16, count=n_frames * FRAME_SAMPLES)
+            utterances = ep.process_buffer(frames)
+            del frames
+            del ingest[: n_frames * frame_bytes]
 
             for utt in utterances:
-                audio_f32 = utt.astype(np.float32) / 32768.0
-                segments, info = whisper_model.transcribe(
-                    audio_f32,
-                    language="en",
-                    beam_size=5,
-                    best_of=5,
-                    temperature=0.0,
-                    vad_filter=False,
-                    condition_on_previous_text=False,
-                    initial_prompt=initial_prompt(),
-                )
-
-                raw_parts: List[str] = []
-                parts: List[str] = []
-                dropped_segments = 0
-                for seg in segments:
-                    txt = (getattr(seg, "text", "") or "").strip()
-                    if not txt:
-                        continue
-                    raw_parts.append(txt)
-                    avg_lp = float(getattr(seg, "avg_logprob", 0.0))
-                    comp   = float(getattr(seg, "compression_ratio", 0.0))
-                    low_conf = avg_lp < MIN_AVG_LOGPROB
-                    over_comp = comp > MAX_COMPRESSION_RATIO
-                    if low_conf or over_comp:
-                        dropped_segments += 1
-                        continue
-                    if txt.lower() in {"thank you.", "okay.", "ok.", "you.", "bye."}:
-                        dropped_segments += 1
-                        continue
-                    parts.append(txt)
-
-                if not parts:
-                    if raw_parts:
-                        if dropped_segments:
-                            print(
-                                f"[/audio] low-confidence fallback: using {len(raw_parts)} raw segments "
-                                f"(dropped {dropped_segments} by threshold)"
-                            )
-                        parts = raw_parts
-                    else:
-                        continue
-
-                if not parts:
-                    continue
-
-                transcript = normalize_text(" ".join(parts))
-                print(f"[/audio] transcript: {transcript}")
-
-                data = await summarize_original_style(transcript)
-
-                # Validate into Pydantic model (ensures exact schema and persist)
-                try:
-                    chunk_model = ChunkStructuredOutput.model_validate(data)
-                except Exception:
-                    # Fallback: try constructing directly from dict
-                    chunk_model = ChunkStructuredOutput(**data)
-
-                await persist_chunk_model(chunk_model, transcript)
-
-                # --- Broadcast mapped to UI ---
-                for item in chunk_model.world_state_updates:
-                    upd = (item.update or "").strip()
-                    loc = (item.location or "").strip()
-                    if upd:
-                        await broadcast_event(
-                            {
-                                "heading": "World State Update",
-                                "content": upd,
-                                "location": loc,  # expose location for UI display
-                            }
-                        )
-
-                for item in chunk_model.character_events:
-                    who = item.character or "Unknown"
-                    action = (item.action or "").strip()
-                    outcome = (item.outcome or "").strip()
-                    if action:
-                        await broadcast_event({"heading": f"Character Action: {who}", "content": action})
-                    if outcome:
-                        await broadcast_event({"heading": f"Character Outcome: {who}", "content": outcome})
-
-                for item in chunk_model.quest_updates:
-                    quest = item.quest or "Quest"
-                    update = (item.update or "").strip()
-                    if update:
-                        await broadcast_event({"heading": "Quest Update", "quest_name": quest, "content": update})
+                utt_queue.put_nowait(utt)
 
     except WebSocketDisconnect:
         print("[/audio] Audio client disconnected")
@@ -831,10 +1190,22 @@ async def ws_audio(websocket: WebSocket) -> None:
             await websocket.close()
         except Exception:
             pass
+        # Let already-queued utterances finish so their chunks still get persisted.
+        utt_queue.put_nowait(None)
+        await worker
 
 # ==================== STABLE DIFFUSION PART ====================
 SD_API_URL = "http://127.0.0.1:7860"
 
+# One pooled async client so SD calls never block the event loop and reuse connections.
+_sd_client = httpx.AsyncClient(base_url=SD_API_URL, timeout=httpx.Timeout(300.0))
+
+
+@app.on_event("shutdown")
+async def _close_sd_client() -> None:
+    await _sd_client.aclose()
+
+
 class GenerateRequest(BaseModel):
     prompt: str
     model: Optional[str] = None  # optional: user can specify which model to use
@@ -848,33 +1219,35 @@ class GenerateRequest(BaseModel):
 async def list_models():
     """Fetch list of available SD models dynamically."""
     try:
-        response = requests.get(f"{SD_API_URL}/sdapi/v1/sd-models")
-        return response.json()
+        response = await _sd_client.get("/sdapi/v1/sd-models")
+        return orjson.loads(response.content)
     except Exception as e:
         return {"error": str(e)}
 
 
+# Checkpoint we last switched SD to, so repeat requests skip the (slow) model reload call.
+_sd_current_model: Optional[str] = None
+
+
 @app.post("/generate-image/")
 async def generate_image(req: GenerateRequest):
+    global _sd_current_model
     payload = req.dict()
 
-    if req.model:
+    if req.model and req.model != _sd_current_model:
         try:
-            await asyncio.to_thread(
-                requests.post,
-                f"{SD_API_URL}/sdapi/v1/options",
+            resp = await _sd_client.post(
+                "/sdapi/v1/options",
                 json={"sd_model_checkpoint": req.model}
             )
         except Exception as e:
             return {"error": f"Failed to set model: {str(e)}"}
+        if resp.is_success:
+            _sd_current_model = req.model
 
     try:
-        response = await asyncio.to_thread(
-            requests.post,
-            f"{SD_API_URL}/sdapi/v1/txt2img",
-            json=payload
-        )
-        data = response.json()
+        response = await _sd_client.post("/sdapi/v1/txt2img", json=payload)
+        data = orjson.loads(response.content)
         # return image as base64 (UI can render it with <img src="data:image/png;base64,..."/>)
         return {"image": data["images"][0]}
     except Exception as e:
@@ -883,4 +1256,13 @@ async def generate_image(req: GenerateRequest):
 # ---------------- main ----------------
 if __name__ == "__main__":
     print(f"[ollama] target: {os.environ.get('OLLAMA_URL','http://127.0.0.1:11434')}  model: {OLLAMA_MODEL}")
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    print(f"[uvicorn] event loop: {UVICORN_LOOP}  http: {UVICORN_HTTP}")
+    # UI frames are small JSON; per-message deflate costs more CPU than it saves on localhost.
+    uvicorn.run(
+        app,
+        host="127.0.0.1",
+        port=8000,
+        loop=UVICORN_LOOP,
+        http=UVICORN_HTTP,
+        ws_per_message_deflate=False,
+    )
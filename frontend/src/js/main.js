@@ -564,7 +564,13 @@ ws.onopen = () => {
 };
 
 ws.onmessage = (event) => {
-  const msg = JSON.parse(event.data);
+  const data = JSON.parse(event.data);
+  // Events from one transcript chunk arrive together as {"type":"chunk","events":[...]}
+  const events = data.type === "chunk" ? data.events : [data];
+  events.forEach(handleServerEvent);
+};
+
+function handleServerEvent(msg) {
   console.log("📩 Received:", msg);
 
   let wrap; // will hold the final message element
@@ -688,7 +694,7 @@ ws.onmessage = (event) => {
 
   // ---------------- Append message to log ----------------
   if (wrap) addLogMessage(wrap.outerHTML);
-};
+}
 
 (function initThemeToggle() {
   const KEY = "ds-theme";
@@ -90,37 +90,39 @@
       uiWs.onopen = () => L("/ws open");
       uiWs.onmessage = (ev) => {
         try {
-          const m = JSON.parse(ev.data);
+          const data = JSON.parse(ev.data);
+          const events = data.type === "chunk" ? data.events : [data];
+          for (const m of events) {
+            // เดิม: โชว์สรุป
+            if (m.type === "summary") pushSummary(m.text || "");
 
-          // เดิม: โชว์สรุป
-          if (m.type === "summary") pushSummary(m.text || "");
+            // ใหม่: เด้ง toast เมื่อมี Quest Update
+            if (m.heading === "Quest Update") {
+              const title = m.quest_name
+                ? `Quest Received: ${m.quest_name}`
+                : "Quest Update";
+              showToast(title, m.content || "");
 
-          // ใหม่: เด้ง toast เมื่อมี Quest Update
-          if (m.heading === "Quest Update") {
-            const title = m.quest_name
-              ? `Quest Received: ${m.quest_name}`
-              : "Quest Update";
-            showToast(title, m.content || "");
-
-            // เติมลง Recent Quests panel ด้วย (ตัวเลือก)
-            const qlist = document.getElementById("quest-list");
-            if (qlist) {
-              document.getElementById("quest-placeholder")?.remove();
-              const item = document.createElement("div");
-              item.className = "quest-list-item";
-              item.style.padding = "10px 12px";
-              item.style.borderBottom = "1px solid rgba(255,255,255,.08)";
-              item.innerHTML = `
-                <div style="display:flex;align-items:center;gap:8px;margin-bottom:4px">
-                  <span class="pill pill-red" style="font-size:11px">Quest</span>
-                  <strong>${escapeHtml(m.quest_name || "Quest")}</strong>
-                </div>
-                <div class="muted" style="opacity:.8">${escapeHtml(
-                  m.content || ""
-                )}</div>
-              `;
-              qlist.prepend(item);
-              qlist.scrollTop = 0;
+              // เติมลง Recent Quests panel ด้วย (ตัวเลือก)
+              const qlist = document.getElementById("quest-list");
+              if (qlist) {
+                document.getElementById("quest-placeholder")?.remove();
+                const item = document.createElement("div");
+                item.className = "quest-list-item";
+                item.style.padding = "10px 12px";
+                item.style.borderBottom = "1px solid rgba(255,255,255,.08)";
+                item.innerHTML = `
+                  <div style="display:flex;align-items:center;gap:8px;margin-bottom:4px">
+                    <span class="pill pill-red" style="font-size:11px">Quest</span>
+                    <strong>${escapeHtml(m.quest_name || "Quest")}</strong>
+                  </div>
+                  <div class="muted" style="opacity:.8">${escapeHtml(
+                    m.content || ""
+                  )}</div>
+                `;
+                qlist.prepend(item);
+                qlist.scrollTop = 0;
+              }
             }
           }
         } catch {}